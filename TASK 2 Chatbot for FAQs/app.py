@@ -4,7 +4,7 @@ Simple and interactive chat interface
 """
 
 import streamlit as st
-from chatbot import FAQChatbot, FAQ_DATABASE, TOPIC
+from chatbot import FAQChatbot, TOPIC, chatbot as default_chatbot
 import time
 
 # Page configuration
@@ -15,50 +15,26 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS
-st.markdown("""
-    <style>
-    .chat-message {
-        padding: 1rem;
-        border-radius: 0.5rem;
-        margin-bottom: 1rem;
-        display: flex;
-        gap: 1rem;
-    }
-    .user-message {
-        background-color: #e3f2fd;
-        border-left: 4px solid #2196F3;
-    }
-    .bot-message {
-        background-color: #f3e5f5;
-        border-left: 4px solid #9c27b0;
-    }
-    .similarity-badge {
-        display: inline-block;
-        padding: 0.25rem 0.75rem;
-        border-radius: 1rem;
-        font-size: 0.85rem;
-        font-weight: bold;
-        margin-top: 0.5rem;
-    }
-    .high {
-        background-color: #4CAF50;
-        color: white;
-    }
-    .medium {
-        background-color: #FF9800;
-        color: white;
-    }
-    .low {
-        background-color: #f44336;
-        color: white;
-    }
-    </style>
-""", unsafe_allow_html=True)
+# Badge colors for each confidence level
+CONFIDENCE_COLORS = {
+    'high': 'green',
+    'medium': 'orange',
+    'low': 'red'
+}
 
-# Initialize session state
+
+@st.cache_resource
+def get_matcher():
+    """
+    Fitted FAQ matcher shared read-only by all sessions. Importing chatbot
+    already fits one for its module-level instance, so reuse that one.
+    """
+    return default_chatbot.matcher
+
+
+# Initialize session state (conversation history stays per session)
 if 'chatbot' not in st.session_state:
-    st.session_state.chatbot = FAQChatbot()
+    st.session_state.chatbot = FAQChatbot(matcher=get_matcher())
 
 if 'messages' not in st.session_state:
     st.session_state.messages = []
@@ -114,42 +90,18 @@ st.subheader("💬 Chat")
 
 # Display chat history
 for message in st.session_state.messages:
-    if message['role'] == 'user':
-        st.markdown(
-            f"""
-            <div class="chat-message user-message">
-                <div style="flex: 1;">
-                    <strong>You:</strong><br/>
-                    {message['content']}
-                </div>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-    else:
-        confidence_badge = ""
-        if show_confidence and 'match_info' in message:
-            confidence = message['match_info']['confidence']
-            score = message['match_info']['similarity_score']
-            confidence_badge = f'<span class="similarity-badge {confidence}">Confidence: {confidence.upper()} ({score:.2%})</span>'
-        
-        matched_question = ""
-        if 'match_info' in message and message['match_info']['matched_question']:
-            matched_question = f"<br/><small><strong>Matched:</strong> {message['match_info']['matched_question']}</small>"
+    with st.chat_message('user' if message['role'] == 'user' else 'assistant'):
+        st.markdown(message['content'])
         
-        st.markdown(
-            f"""
-            <div class="chat-message bot-message">
-                <div style="flex: 1;">
-                    <strong>Bot:</strong><br/>
-                    {message['content']}
-                    {confidence_badge}
-                    {matched_question}
-                </div>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+        if 'match_info' in message:
+            match_info = message['match_info']
+            if show_confidence:
+                confidence = match_info['confidence']
+                score = match_info['similarity_score']
+                color = CONFIDENCE_COLORS.get(confidence, 'gray')
+                st.caption(f":{color}[**Confidence: {confidence.upper()} ({score:.2%})**]")
+            if match_info['matched_question']:
+                st.caption(f"**Matched:** {match_info['matched_question']}")
 
 # User input
 user_input = st.chat_input("Ask a question about our products and services...")
@@ -163,7 +115,13 @@ if user_input:
     
     # Get bot response
     with st.spinner("Finding best match..."):
-        response = st.session_state.chatbot.get_response(user_input, threshold=similarity_threshold)
+        if show_similar:
+            # Best match and similar questions come from the same similarity pass
+            response, similar = st.session_state.chatbot.get_response_with_similar(
+                user_input, threshold=similarity_threshold, top_n=3
+            )
+        else:
+            response = st.session_state.chatbot.get_response(user_input, threshold=similarity_threshold)
     
     # Add bot response to display
     st.session_state.messages.append({
@@ -180,7 +138,6 @@ if user_input:
     if show_similar:
         st.divider()
         with st.expander("📚 Similar Questions", expanded=True):
-            similar = st.session_state.chatbot.get_similar_faqs(user_input, top_n=3)
             if similar:
                 for i, match in enumerate(similar, 1):
                     score = match['similarity_score']
@@ -5,21 +5,26 @@ Orchestrates FAQ matching and response generation
 
 from faq_data import FAQ_DATABASE, TOPIC
 from similarity_matcher import FAQMatcher
-from datetime import datetime
+import time
 
 
 class FAQChatbot:
     """Main chatbot class for handling FAQ queries"""
     
-    def __init__(self, faq_database=None):
+    def __init__(self, faq_database=None, matcher=None):
         """
         Initialize the chatbot
         
         Args:
             faq_database: List of FAQ dictionaries (uses default if not provided)
+            matcher: Already fitted FAQMatcher to share (built from faq_database if not provided)
         """
-        self.faq_database = faq_database or FAQ_DATABASE
-        self.matcher = FAQMatcher(self.faq_database)
+        if matcher is not None:
+            self.faq_database = matcher.faq_database
+            self.matcher = matcher
+        else:
+            self.faq_database = faq_database or FAQ_DATABASE
+            self.matcher = FAQMatcher(self.faq_database)
         self.conversation_history = []
         self.topic = TOPIC
     
@@ -34,19 +39,48 @@ class FAQChatbot:
         Returns:
             Dictionary with response details
         """
+        # Find best matching FAQ
+        match = self.matcher.find_best_match(user_query, threshold=threshold)
+        
+        self._record_turn(user_query, match)
+        return match
+    
+    def get_response_with_similar(self, user_query, threshold=0.3, top_n=3):
+        """
+        Get a response to a user query together with similar FAQ matches,
+        computed from a single similarity pass
+        
+        Args:
+            user_query: The user's question
+            threshold: Minimum similarity score to consider a match
+            top_n: Number of similar results to return
+            
+        Returns:
+            Tuple of (response dictionary, list of similar FAQs)
+        """
+        match, similar = self.matcher.find_best_and_top(
+            user_query, threshold=threshold, top_n=top_n
+        )
+        
+        self._record_turn(user_query, match)
+        return match, similar
+    
+    def _record_turn(self, user_query, match):
+        """
+        Record a user query and the chatbot's matched response. Timestamps are
+        stored as time.time() epoch seconds, which is cheaper than formatting
+        an ISO string every turn.
+        """
         # Record conversation
         self.conversation_history.append({
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': time.time(),
             'user_query': user_query,
             'type': 'user'
         })
         
-        # Find best matching FAQ
-        match = self.matcher.find_best_match(user_query, threshold=threshold)
-        
         # Record chatbot response
         self.conversation_history.append({
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': time.time(),
             'response': match['answer'],
             'type': 'bot',
             'match_info': {
@@ -55,8 +89,6 @@ class FAQChatbot:
                 'confidence': match['confidence']
             }
         })
-        
-        return match
     
     def get_similar_faqs(self, user_query, top_n=3):
         """
@@ -76,7 +108,7 @@ class FAQChatbot:
         return self.faq_database
     
     def get_conversation_history(self):
-        """Get the conversation history"""
+        """Get the conversation history ('timestamp' is in epoch seconds)"""
         return self.conversation_history
     
     def clear_history(self):
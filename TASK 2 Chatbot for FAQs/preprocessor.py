@@ -4,18 +4,13 @@ Handles text tokenization, cleaning, and normalization using NLTK
 """
 
 import nltk
-from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
 import string
 import re
+from functools import lru_cache
 
 # Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt', quiet=True)
-
 try:
     nltk.data.find('corpora/stopwords')
 except LookupError:
@@ -31,13 +26,37 @@ try:
 except LookupError:
     nltk.download('omw-1.4', quiet=True)
 
+# Shared NLP resources, loaded once at import time
+_LEMMATIZER = WordNetLemmatizer()
+_STOP_WORDS = frozenset(stopwords.words('english'))
+
+# URLs, email addresses, and any run of non-letter characters, removed in one pass
+_CLEAN_RE = re.compile(r'http\S+|www\S+|https\S+|\S+@\S+|[^a-zA-Z\s]+')
+
+# Cleaned text is lowercase letters and whitespace only, so words are letter runs
+_TOKEN_RE = re.compile(r'[a-z]+')
+
+
+@lru_cache(maxsize=8192)
+def _lemmatize_token(token):
+    """Memoized WordNet lemmatization of a single token"""
+    return _LEMMATIZER.lemmatize(token)
+
 
 class TextPreprocessor:
     """Preprocesses text for FAQ matching"""
     
+    # Maximum number of distinct input strings whose processed form is cached
+    CACHE_SIZE = 2048
+    
     def __init__(self):
-        self.lemmatizer = WordNetLemmatizer()
-        self.stop_words = set(stopwords.words('english'))
+        self.lemmatizer = _LEMMATIZER
+        self.stop_words = _STOP_WORDS
+        
+        # Repeated queries collapse to a dict lookup instead of the full pipeline
+        self._preprocess_to_string_cached = lru_cache(maxsize=self.CACHE_SIZE)(
+            self._preprocess_to_string
+        )
     
     def clean_text(self, text):
         """
@@ -52,14 +71,8 @@ class TextPreprocessor:
         # Convert to lowercase
         text = text.lower()
         
-        # Remove URLs
-        text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-        
-        # Remove email addresses
-        text = re.sub(r'\S+@\S+', '', text)
-        
-        # Remove special characters and digits, keep only letters and spaces
-        text = re.sub(r'[^a-zA-Z\s]', '', text)
+        # Remove URLs, email addresses, special characters and digits
+        text = _CLEAN_RE.sub('', text)
         
         # Remove extra whitespace
         text = ' '.join(text.split())
@@ -76,8 +89,7 @@ class TextPreprocessor:
         Returns:
             List of tokens
         """
-        tokens = word_tokenize(text)
-        return tokens
+        return _TOKEN_RE.findall(text)
     
     def remove_stopwords(self, tokens):
         """
@@ -101,7 +113,7 @@ class TextPreprocessor:
         Returns:
             List of lemmatized tokens
         """
-        return [self.lemmatizer.lemmatize(token) for token in tokens]
+        return [_lemmatize_token(token) for token in tokens]
     
     def preprocess(self, text):
         """
@@ -137,6 +149,10 @@ class TextPreprocessor:
         Returns:
             Processed text as string
         """
+        return self._preprocess_to_string_cached(text)
+    
+    def _preprocess_to_string(self, text):
+        """Uncached implementation of preprocess_to_string"""
         tokens = self.preprocess(text)
         return ' '.join(tokens)
 
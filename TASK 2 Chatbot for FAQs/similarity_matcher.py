@@ -3,33 +3,94 @@ Similarity matching module using cosine similarity
 Matches user queries with FAQ questions
 """
 
+import glob
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import joblib
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
 from preprocessor import preprocessor
 
+_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Fitted matcher state is persisted here to skip refitting on cold start,
+# in one file per FAQ set so different databases don't evict each other
+DEFAULT_CACHE_DIR = _MODULE_DIR
+
+# Most cache files kept per directory; the least recently written go first
+CACHE_MAX_FILES = 8
+
+# Source files that determine the fitted state; edits invalidate the cache
+_CACHE_SOURCES = [
+    os.path.join(_MODULE_DIR, name)
+    for name in ('faq_data.py', 'preprocessor.py', 'similarity_matcher.py')
+]
+
+# Answer returned when no FAQ meets the similarity threshold
+NO_MATCH_ANSWER = (
+    "I'm sorry, I couldn't find a matching answer in our FAQ database. "
+    "Please contact our support team for assistance."
+)
+
+
+def _is_stale(cache_path):
+    """Whether a cache file predates an edit to the sources it was built from"""
+    cache_mtime = os.path.getmtime(cache_path)
+    return any(os.path.getmtime(src) > cache_mtime
+               for src in _CACHE_SOURCES if os.path.exists(src))
+
 
 class FAQMatcher:
     """Matches user questions with FAQ database using cosine similarity"""
     
-    def __init__(self, faq_database):
+    # Maximum number of user queries whose similarity scores are cached
+    SIM_CACHE_SIZE = 1024
+    
+    def __init__(self, faq_database, cache_dir=DEFAULT_CACHE_DIR):
         """
         Initialize the FAQ matcher
         
         Args:
             faq_database: List of FAQ dictionaries with 'question' and 'answer' keys
+            cache_dir: Directory to persist the fitted TF-IDF weights in (None disables it)
         """
         self.faq_database = faq_database
-        self.vectorizer = TfidfVectorizer(
+        
+        # Flat answer/question tables so results index directly by FAQ position
+        self._answers = tuple(faq['answer'] for faq in faq_database)
+        self._questions = tuple(faq['question'] for faq in faq_database)
+        
+        # The cache file is named after a hash of the FAQ questions
+        self.cache_path = None
+        if cache_dir:
+            digest = hashlib.sha1('\0'.join(self._questions).encode('utf-8')).hexdigest()
+            self.cache_path = os.path.join(cache_dir, f'faq_matcher-{digest[:16]}.pkl')
+        self.cache_dir = cache_dir
+        
+        # Hashing needs no vocabulary fit; only the IDF weights are learned.
+        # The hash space is large so distinct terms practically never share a
+        # column (only FAQ columns are kept, so its size costs nothing).
+        self.hasher = HashingVectorizer(
             lowercase=True,
             stop_words='english',
             ngram_range=(1, 2),
-            min_df=1,
-            max_df=0.9
+            n_features=2 ** 20,
+            alternate_sign=False,
+            norm=None
         )
         
-        # Preprocess and vectorize FAQ questions
-        self.preprocess_faqs()
+        # LRU cache of raw user query -> similarity scores against all FAQs.
+        # Guarded by a lock since one matcher may be shared across UI sessions.
+        self._sim_cache = OrderedDict()
+        self._sim_cache_lock = threading.Lock()
+        
+        # Load the fitted state from disk, or preprocess and vectorize FAQ questions
+        if not self._load_cache():
+            self.preprocess_faqs()
+            self._save_cache()
     
     def preprocess_faqs(self):
         """Preprocess and vectorize all FAQ questions"""
@@ -39,8 +100,141 @@ class FAQMatcher:
             for faq in self.faq_database
         ]
         
-        # Vectorize using TF-IDF
-        self.faq_vectors = self.vectorizer.fit_transform(self.faq_questions)
+        # Hash FAQ terms and keep only the columns that occur in some FAQ. A
+        # query term outside them is dropped like an out-of-vocabulary word,
+        # unless it collides with an FAQ term's column, which the large hash
+        # space makes vanishingly unlikely
+        faq_counts = self.hasher.transform(self.faq_questions)
+        self.vocab_columns = np.unique(faq_counts.indices)
+        
+        # Vectorize using TF-IDF (rows are L2-normalized by the transformer).
+        # Only the IDF weights of the FAQ columns are needed afterwards.
+        tfidf = TfidfTransformer(norm='l2')
+        faq_matrix = tfidf.fit_transform(faq_counts)[:, self.vocab_columns]
+        self.idf = tfidf.idf_[self.vocab_columns].astype(np.float32)
+        
+        # The FAQ set is small, so a dense float32 matrix lets each query be
+        # scored with a single BLAS matrix-vector product
+        self.faq_vectors = faq_matrix.toarray().astype(np.float32)
+        
+        self._seed_sim_cache()
+    
+    def _seed_sim_cache(self):
+        """Reset the similarity cache for the current FAQ vectors"""
+        # Seed the cache with the FAQ questions themselves so a query that
+        # repeats a FAQ verbatim skips preprocessing and vectorization
+        faq_similarities = self.faq_vectors @ self.faq_vectors.T
+        
+        with self._sim_cache_lock:
+            # Cached scores are only valid for the current FAQ vectors
+            self._sim_cache.clear()
+            for question, similarities in zip(self._questions, faq_similarities):
+                self._sim_cache[question] = similarities
+    
+    def _load_cache(self):
+        """
+        Load the fitted TF-IDF weights and FAQ vectors from the cache file
+        
+        Returns:
+            True if a valid cache for this FAQ database was loaded, False otherwise
+        """
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+        
+        if _is_stale(self.cache_path):
+            return False
+        
+        try:
+            raw_questions, vocab_columns, idf, faq_vectors, faq_questions = joblib.load(
+                self.cache_path
+            )
+        except Exception:
+            return False
+        
+        # The cache is only usable for the exact FAQ set it was built from
+        if raw_questions != list(self._questions):
+            return False
+        
+        self.vocab_columns = vocab_columns
+        self.idf = idf
+        self.faq_vectors = faq_vectors
+        self.faq_questions = faq_questions
+        self._seed_sim_cache()
+        return True
+    
+    def _save_cache(self):
+        """
+        Persist the fitted TF-IDF weights and FAQ vectors to the cache file,
+        removing stale cache files from the cache directory
+        """
+        if not self.cache_path:
+            return
+        
+        state = (
+            list(self._questions),
+            self.vocab_columns,
+            self.idf,
+            self.faq_vectors,
+            self.faq_questions
+        )
+        try:
+            joblib.dump(state, self.cache_path)
+        except OSError:
+            # A read-only install just refits on every start
+            return
+        
+        # Drop caches built from older sources, and the oldest ones beyond
+        # CACHE_MAX_FILES (e.g. from earlier revisions of a custom FAQ set)
+        others = [
+            path for path in glob.glob(os.path.join(self.cache_dir, 'faq_matcher-*.pkl'))
+            if path != self.cache_path
+        ]
+        others.sort(key=os.path.getmtime, reverse=True)
+        for i, path in enumerate(others):
+            if i >= CACHE_MAX_FILES - 1 or _is_stale(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+    
+    def _similarities(self, user_query):
+        """
+        Compute cosine similarity between a user query and all FAQ questions.
+        Results are cached per raw query string so that repeated calls for the
+        same query (e.g. best match followed by top matches) skip the
+        preprocess/vectorize/cosine pass.
+        
+        Args:
+            user_query: User's question string
+            
+        Returns:
+            1-D numpy array of similarity scores, one per FAQ
+        """
+        with self._sim_cache_lock:
+            similarities = self._sim_cache.get(user_query)
+            if similarities is not None:
+                self._sim_cache.move_to_end(user_query)
+                return similarities
+        
+        # Preprocess user query
+        processed_query = preprocessor.preprocess_to_string(user_query)
+        
+        # Vectorize user query over the FAQ features and L2-normalize it
+        query_counts = self.hasher.transform([processed_query])[:, self.vocab_columns]
+        query_vector = query_counts.toarray().astype(np.float32).ravel() * self.idf
+        query_norm = np.linalg.norm(query_vector)
+        if query_norm > 0:
+            query_vector /= query_norm
+        
+        # Both sides are unit length, so cosine similarity is just the dot product
+        similarities = self.faq_vectors @ query_vector
+        
+        with self._sim_cache_lock:
+            self._sim_cache[user_query] = similarities
+            while len(self._sim_cache) > self.SIM_CACHE_SIZE:
+                self._sim_cache.popitem(last=False)
+        
+        return similarities
     
     def find_best_match(self, user_query, threshold=0.3):
         """
@@ -54,15 +248,44 @@ class FAQMatcher:
             Dictionary with 'answer', 'similarity_score', 'matched_question', and 'faq_index'
             or None if no match meets threshold
         """
-        # Preprocess user query
-        processed_query = preprocessor.preprocess_to_string(user_query)
-        
-        # Vectorize user query
-        query_vector = self.vectorizer.transform([processed_query])
+        return self._best_match_from(self._similarities(user_query), threshold)
+    
+    def find_top_matches(self, user_query, top_n=3, threshold=0.2):
+        """
+        Find top N matching FAQs for a user query
         
-        # Calculate cosine similarity with all FAQ questions
-        similarities = cosine_similarity(query_vector, self.faq_vectors)[0]
+        Args:
+            user_query: User's question string
+            top_n: Number of top matches to return
+            threshold: Minimum similarity score
+            
+        Returns:
+            List of match dictionaries sorted by similarity score (descending)
+        """
+        return self._top_matches_from(self._similarities(user_query), top_n, threshold)
+    
+    def find_best_and_top(self, user_query, threshold=0.3, top_n=3, top_threshold=0.2):
+        """
+        Find the best match and the top N matches from a single similarity pass
         
+        Args:
+            user_query: User's question string
+            threshold: Minimum similarity score for the best match
+            top_n: Number of top matches to return
+            top_threshold: Minimum similarity score for the top matches
+            
+        Returns:
+            Tuple of (best match dictionary as from find_best_match,
+            list of top matches as from find_top_matches)
+        """
+        similarities = self._similarities(user_query)
+        return (
+            self._best_match_from(similarities, threshold),
+            self._top_matches_from(similarities, top_n, top_threshold)
+        )
+    
+    def _best_match_from(self, similarities, threshold):
+        """Build the best match result from precomputed similarity scores"""
         # Find best match
         best_match_idx = np.argmax(similarities)
         best_similarity = similarities[best_match_idx]
@@ -70,7 +293,7 @@ class FAQMatcher:
         # Check if similarity meets threshold
         if best_similarity < threshold:
             return {
-                'answer': "I'm sorry, I couldn't find a matching answer in our FAQ database. Please contact our support team for assistance.",
+                'answer': NO_MATCH_ANSWER,
                 'similarity_score': float(best_similarity),
                 'matched_question': None,
                 'faq_index': -1,
@@ -79,44 +302,31 @@ class FAQMatcher:
         
         # Return best match
         return {
-            'answer': self.faq_database[best_match_idx]['answer'],
+            'answer': self._answers[best_match_idx],
             'similarity_score': float(best_similarity),
-            'matched_question': self.faq_database[best_match_idx]['question'],
+            'matched_question': self._questions[best_match_idx],
             'faq_index': best_match_idx,
             'confidence': 'high' if best_similarity > 0.6 else 'medium'
         }
     
-    def find_top_matches(self, user_query, top_n=3, threshold=0.2):
-        """
-        Find top N matching FAQs for a user query
-        
-        Args:
-            user_query: User's question string
-            top_n: Number of top matches to return
-            threshold: Minimum similarity score
-            
-        Returns:
-            List of match dictionaries sorted by similarity score (descending)
-        """
-        # Preprocess user query
-        processed_query = preprocessor.preprocess_to_string(user_query)
-        
-        # Vectorize user query
-        query_vector = self.vectorizer.transform([processed_query])
-        
-        # Calculate cosine similarity with all FAQ questions
-        similarities = cosine_similarity(query_vector, self.faq_vectors)[0]
+    def _top_matches_from(self, similarities, top_n, threshold):
+        """Build the top matches result from precomputed similarity scores"""
+        # Nothing to return if no FAQ can clear the threshold
+        k = min(top_n, similarities.size)
+        if k <= 0 or similarities.max() < threshold:
+            return []
         
-        # Get indices of top matches
-        top_indices = np.argsort(similarities)[::-1][:top_n]
+        # Get indices of top matches: partial select the top k, then sort only those
+        top_indices = np.argpartition(-similarities, k - 1)[:k]
+        top_indices = top_indices[np.argsort(-similarities[top_indices], kind='stable')]
         
         matches = []
         for idx in top_indices:
             if similarities[idx] >= threshold:
                 matches.append({
-                    'answer': self.faq_database[idx]['answer'],
+                    'answer': self._answers[idx],
                     'similarity_score': float(similarities[idx]),
-                    'matched_question': self.faq_database[idx]['question'],
+                    'matched_question': self._questions[idx],
                     'faq_index': idx,
                     'confidence': 'high' if similarities[idx] > 0.6 else 'medium'
                 })
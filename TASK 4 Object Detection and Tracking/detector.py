@@ -2,48 +2,435 @@
 Object Detection using YOLOv8
 """
 
+import re
+from contextlib import nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+
 import cv2
 import numpy as np
-from ultralytics import YOLO
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Gray used to pad letterboxed frames (same as ultralytics)
+PAD_VALUE = 114
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True, fastmath=True)
+    def _resize_into(frame, dst, left, top, new_w, new_h):
+        """
+        Bilinear-resize a BGR (H, W, 3) frame into dst[:, top:top+new_h, left:left+new_w]
+        as RGB planes, in one pass (fused resize + BGR->RGB + HWC->CHW)
+        """
+        h, w = frame.shape[0], frame.shape[1]
+        scale_y = h / new_h
+        scale_x = w / new_w
+        for y in prange(new_h):
+            # Same pixel-center mapping as cv2.INTER_LINEAR
+            fy = max((y + 0.5) * scale_y - 0.5, 0.0)
+            y0 = min(int(fy), h - 1)
+            y1 = min(y0 + 1, h - 1)
+            wy = fy - y0
+            for x in range(new_w):
+                fx = max((x + 0.5) * scale_x - 0.5, 0.0)
+                x0 = min(int(fx), w - 1)
+                x1 = min(x0 + 1, w - 1)
+                wx = fx - x0
+                for c in range(3):
+                    upper = frame[y0, x0, c] * (1.0 - wx) + frame[y0, x1, c] * wx
+                    lower = frame[y1, x0, c] * (1.0 - wx) + frame[y1, x1, c] * wx
+                    dst[2 - c, top + y, left + x] = np.uint8(upper * (1.0 - wy) + lower * wy + 0.5)
+else:
+    def _resize_into(frame, dst, left, top, new_w, new_h):
+        """Resize a BGR frame into dst's RGB planes with cv2 and a strided copy"""
+        if (new_w, new_h) != (frame.shape[1], frame.shape[0]):
+            frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        # One strided copy does both BGR->RGB and HWC->CHW
+        dst[:, top:top + new_h, left:left + new_w] = frame[:, :, ::-1].transpose(2, 0, 1)
+
+
+@dataclass
+class Detections:
+    """Detections for one frame, stored as parallel arrays (struct-of-arrays)"""
+    
+    xyxy: np.ndarray   # (N, 4) float32 boxes as [x1, y1, x2, y2]
+    conf: np.ndarray   # (N,) float32 confidence scores
+    cls: np.ndarray    # (N,) int32 class ids
+    names: list        # class name of each detection
+    
+    def __len__(self):
+        return len(self.conf)
+    
+    @classmethod
+    def empty(cls):
+        """Detections for a frame with nothing detected"""
+        return cls(
+            xyxy=np.empty((0, 4), dtype=np.float32),
+            conf=np.empty(0, dtype=np.float32),
+            cls=np.empty(0, dtype=np.int32),
+            names=[]
+        )
 
 
 class ObjectDetector:
     """YOLOv8-based object detector"""
     
-    def __init__(self, model_name='yolov8n.pt', confidence=0.5):
+    # NMS settings for the CUDA path (ultralytics predict() defaults)
+    NMS_IOU = 0.7
+    MAX_DET = 300
+    
+    def __init__(self, model_name='yolov8n.pt', confidence=0.5, device=None, half=None,
+                 tensorrt=False, max_batch=1, imgsz=640):
         """
         Initialize detector with YOLOv8 model.
-        model_name: 'yolov8n', 'yolov8s', 'yolov8m', 'yolov8l', 'yolov8x'
+        model_name: 'yolov8n', 'yolov8s', 'yolov8m', 'yolov8l', 'yolov8x', or a TensorRT .engine file
         confidence: Detection confidence threshold
+        device: Inference device (e.g. 0 or 'cpu'); defaults to the first GPU if available
+        half: Run FP16 inference; defaults to True on GPU and False on CPU
+        tensorrt: Build and run an FP16 TensorRT engine (CUDA only)
+        max_batch: Largest batch a built TensorRT engine must accept
+        imgsz: Square network input size used on CUDA and for built TensorRT
+            engines (a loaded engine's own input size takes precedence)
         """
-        self.model = YOLO(model_name)
+        # Deferred so importing this module doesn't pull in torch/ultralytics
+        import torch
+        from ultralytics import YOLO
+        
+        if device is None:
+            device = 0 if torch.cuda.is_available() else 'cpu'
+        self.device = device
+        self.half = (device != 'cpu') if half is None else half
+        self.imgsz = imgsz
+        
+        # Dedicated CUDA stream so inference, including its host-to-device
+        # copies, doesn't serialize with work queued on other threads' streams
+        self.stream = torch.cuda.Stream(device=device) if device != 'cpu' else None
+        
+        if tensorrt and not str(model_name).endswith('.engine'):
+            model_name = self._build_engine(model_name, max_batch)
+        
+        is_engine = str(model_name).endswith('.engine')
+        if is_engine:
+            # Engines are already fused and have their precision baked in
+            self.model = YOLO(model_name, task='detect')
+        else:
+            self.model = YOLO(model_name)
+            self.model.fuse()
         self.confidence = confidence
         self.class_names = self.model.names
         
+        # Largest batch a TensorRT engine accepts (None for PyTorch models), and
+        # whether it takes smaller batches too or only exactly that many frames
+        self.engine_batch = None
+        self._engine_dynamic = True
+        
+        # On CUDA, frames are letterboxed into a pinned host buffer, copied by
+        # DMA into a persistent device buffer, then fed straight to the network
+        # through ultralytics' AutoBackend (see _detect_on_device)
+        self.host_buf = None
+        self.dev_buf = None
+        self._backend = None
+        self._graph = None
+        if self.stream is not None:
+            from ultralytics.nn.autobackend import AutoBackend
+            
+            self._backend = AutoBackend(
+                model_name if is_engine else self.model.model,
+                device=self.stream.device,
+                fp16=self.half,
+                verbose=False
+            )
+            self._backend.eval()
+            self.class_names = self._backend.names
+            if self._backend.engine:
+                # An engine's input size and batch are baked in; its input
+                # binding is sized to the largest shape it accepts
+                batch, _, height, width = self._backend.bindings['images'].shape
+                if height != width:
+                    raise ValueError(f"TensorRT engine input must be square, got {height}x{width}")
+                self.engine_batch, self.imgsz = batch, height
+                self._engine_dynamic = self._backend.dynamic
+            
+            self._allocate_buffers(self.engine_batch or max_batch)
+            # A static-batch engine only accepts a full batch
+            warmup_batch = 1 if self._engine_dynamic else self.engine_batch
+            self._backend.warmup(imgsz=(warmup_batch, 3, self.imgsz, self.imgsz))
+    
+    def _build_engine(self, model_name, max_batch=1):
+        """
+        Export a PyTorch model to an FP16 TensorRT engine, cached next to the .pt file.
+        Returns: path of the engine file
+        """
+        from ultralytics import YOLO
+        
+        if self.device == 'cpu':
+            raise ValueError("TensorRT engines require a CUDA device")
+        try:
+            import tensorrt as trt
+        except ImportError as e:
+            raise ImportError("TensorRT engines need the tensorrt package") from e
+        
+        import torch
+        
+        model_path = Path(model_name)
+        # Input size and batch are baked into the engine, and an engine only
+        # runs on the GPU model and TensorRT version it was built with, so all
+        # of them key the cache
+        gpu = re.sub(r'[^A-Za-z0-9]+', '_', torch.cuda.get_device_name(self.stream.device))
+        engine_path = model_path.with_name(
+            f"{model_path.stem}-fp16-{self.imgsz}-b{max_batch}-{gpu}-trt{trt.__version__}.engine"
+        )
+        if engine_path.exists():
+            return str(engine_path)
+        
+        print(f"Building TensorRT FP16 engine for {model_name} (one-time)...")
+        export_args = dict(
+            format='engine',
+            imgsz=self.imgsz,
+            workspace=4,
+            simplify=True,
+            device=self.device,
+            # Dynamic batch so one engine serves single frames and full batches
+            dynamic=max_batch > 1,
+            batch=max_batch,
+            half=True
+        )
+        exported = YOLO(model_name).export(**export_args)
+        Path(exported).replace(engine_path)
+        return str(engine_path)
+    
     def detect(self, frame):
         """
         Detect objects in frame.
-        Returns: array of shape (N, 4) with format [x1, y1, x2, y2]
+        frame: BGR frame, passed to YOLO as-is (it handles color conversion itself)
+        Returns: Detections with xyxy of shape (N, 4) in format [x1, y1, x2, y2]
         """
         # Run inference
-        results = self.model(frame, conf=self.confidence, verbose=False)
-        
-        detections = []
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                conf = float(box.conf[0])
-                cls_id = int(box.cls[0])
-                detections.append({
-                    'bbox': [x1, y1, x2, y2],
-                    'confidence': conf,
-                    'class_id': cls_id,
-                    'class_name': self.class_names[cls_id]
-                })
-        
-        bboxes = np.array([d['bbox'] for d in detections]) if detections else np.empty((0, 4))
-        return bboxes, detections
+        with self._stream_context():
+            if self._backend is not None:
+                return self._detect_on_device([frame])[0]
+            results = self._infer(frame)
+            return self._parse_result(results[0])
+    
+    def detect_batch(self, frames):
+        """
+        Detect objects in several frames with a single batched forward pass.
+        YOLO letterboxes the frames and stacks them into one (B, 3, H, W) tensor,
+        and boxes come back scaled to each original frame.
+        frames: list of BGR frames
+        Returns: list of Detections, one per frame, as from detect()
+        """
+        if not frames:
+            return []
+        with self._stream_context():
+            if self._backend is not None:
+                return self._detect_on_device(list(frames))
+            results = self._infer(list(frames))
+            return [self._parse_result(result) for result in results]
+    
+    def detect_graph(self, frame):
+        """
+        Detect objects in a single frame by replaying a CUDA Graph of the
+        network's forward pass, which removes per-kernel launch overhead at
+        batch size 1 (webcam use). The graph is captured on the first call.
+        Falls back to detect() on CPU, for TensorRT engines, or if capture fails.
+        frame: BGR frame
+        Returns: Detections, as from detect()
+        """
+        if self._backend is None or self._graph is False:
+            return self.detect(frame)
+        
+        import torch
+        
+        with self._stream_context():
+            if self._graph is None:
+                self._capture_graph()
+                if self._graph is False:
+                    return self._detect_on_device([frame])[0]
+            
+            gain, left, top = self._letterbox_into(frame, self._host_np[0])
+            self.dev_buf[:1].copy_(self.host_buf[:1], non_blocking=True)
+            
+            # Refill the graph's static input in place, then replay
+            self._graph_in.copy_(self.dev_buf[:1]).div_(255.0)
+            self._graph.replay()
+            with torch.inference_mode():
+                output = self._nms(self._graph_out)
+            return self._unletterbox(output[0].cpu().numpy(), gain, left, top, frame.shape)
+    
+    def _capture_graph(self):
+        """
+        Capture the batch-1 forward pass into a CUDA Graph with static input and
+        output tensors. Sets self._graph to False if the model can't be captured.
+        """
+        import torch
+        
+        # TensorRT engines manage their own execution contexts
+        if not self._backend.pt:
+            self._graph = False
+            return
+        
+        dtype = torch.float16 if self._backend.fp16 else torch.float32
+        self._graph_in = torch.zeros((1, 3, self.imgsz, self.imgsz), dtype=dtype, device=self.dev_buf.device)
+        try:
+            with torch.inference_mode():
+                # Warm up on a side stream so lazy init and autotuning aren't captured
+                for _ in range(3):
+                    self._backend(self._graph_in)
+                torch.cuda.current_stream().synchronize()
+                
+                graph = torch.cuda.CUDAGraph()
+                with torch.cuda.graph(graph):
+                    preds = self._backend(self._graph_in)
+        except RuntimeError as e:
+            print(f"CUDA Graph capture failed, using eager inference: {e}")
+            self._graph = False
+            return
+        
+        # The graph replays into the same output tensor every time
+        self._graph_out = preds[0] if isinstance(preds, (list, tuple)) else preds
+        self._graph = graph
+    
+    def _stream_context(self):
+        """
+        Make self.stream current for the calling thread. Results are copied to
+        the host inside this context, so the copies wait on the stream's kernels.
+        """
+        if self.stream is None:
+            return nullcontext()
+        import torch
+        return torch.cuda.stream(self.stream)
+    
+    def _allocate_buffers(self, batch):
+        """Allocate pinned host and device uint8 input buffers for `batch` frames"""
+        import torch
+        
+        shape = (batch, 3, self.imgsz, self.imgsz)
+        self.host_buf = torch.empty(shape, dtype=torch.uint8, pin_memory=True)
+        self._host_np = self.host_buf.numpy()
+        self.dev_buf = torch.empty(shape, dtype=torch.uint8, device=self.stream.device)
+    
+    def _detect_on_device(self, frames):
+        """
+        CUDA path: letterbox frames into the pinned host buffer, upload it to
+        the device buffer, and run the network and NMS there. Frames are
+        uploaded as uint8 (a quarter of the bytes of float32) and normalized
+        on the GPU. Pinned memory lets the upload go straight to the GPU by DMA,
+        without a staging copy, but it is not overlapped with inference: the
+        results are copied back to the host before returning, which syncs the
+        stream, so the single host buffer is free again for the next call.
+        """
+        import torch
+        
+        n = len(frames)
+        if self.engine_batch is not None and n > self.engine_batch:
+            # Split batches larger than the engine accepts
+            step = self.engine_batch
+            return [
+                detections
+                for start in range(0, n, step)
+                for detections in self._detect_on_device(frames[start:start + step])
+            ]
+        if n > self.host_buf.shape[0]:
+            self._allocate_buffers(n)
+        
+        # Letterbox on the host directly into the pinned buffer
+        geometry = [self._letterbox_into(frame, self._host_np[i]) for i, frame in enumerate(frames)]
+        
+        # A static-batch engine always runs its full batch; the results of the
+        # slots past n are ignored
+        run = n if self._engine_dynamic else self.engine_batch
+        
+        # Queued on the inference stream, so the network runs after the copy
+        self.dev_buf[:run].copy_(self.host_buf[:run], non_blocking=True)
+        
+        with torch.inference_mode():
+            batch = self.dev_buf[:run].half() if self._backend.fp16 else self.dev_buf[:run].float()
+            preds = self._backend(batch.div_(255.0))
+            output = self._nms(preds)
+        
+        return [
+            self._unletterbox(det.cpu().numpy(), *geom, frame.shape)
+            for det, geom, frame in zip(output, geometry, frames)
+        ]
+    
+    def _nms(self, preds):
+        """
+        Non-maximum suppression on raw network output, always in FP32 so an
+        FP16 network doesn't lose box accuracy or drop near-threshold scores.
+        Returns: list of (N, 6) [x1, y1, x2, y2, conf, cls] tensors, one per image
+        """
+        from ultralytics.utils import ops
+        
+        if isinstance(preds, (list, tuple)):
+            preds = preds[0]
+        return ops.non_max_suppression(preds.float(), self.confidence, self.NMS_IOU, max_det=self.MAX_DET)
+    
+    def _letterbox_into(self, frame, dst):
+        """
+        Resize frame to fit imgsz x imgsz keeping its aspect ratio and write it,
+        centered on gray padding, into dst as a (3, imgsz, imgsz) RGB image.
+        Returns: (gain, left, top) to map boxes back to frame coordinates
+        """
+        h, w = frame.shape[:2]
+        gain = min(self.imgsz / h, self.imgsz / w)
+        new_w, new_h = round(w * gain), round(h * gain)
+        left, top = (self.imgsz - new_w) // 2, (self.imgsz - new_h) // 2
+        
+        # Pad only the borders, then write the resized image between them
+        dst[:, :top] = PAD_VALUE
+        dst[:, top + new_h:] = PAD_VALUE
+        dst[:, :, :left] = PAD_VALUE
+        dst[:, :, left + new_w:] = PAD_VALUE
+        _resize_into(np.ascontiguousarray(frame), dst, left, top, new_w, new_h)
+        return gain, left, top
+    
+    def _unletterbox(self, det, gain, left, top, shape):
+        """Convert (N, 6) NMS output in network coordinates into Detections for a frame"""
+        xyxy = np.ascontiguousarray(det[:, :4])
+        xyxy -= (left, top, left, top)
+        xyxy /= gain
+        np.clip(xyxy[:, 0::2], 0, shape[1], out=xyxy[:, 0::2])
+        np.clip(xyxy[:, 1::2], 0, shape[0], out=xyxy[:, 1::2])
+        
+        return self._to_detections(xyxy, det[:, 4].copy(), det[:, 5].astype(np.int32))
+    
+    def _infer(self, source):
+        """Run the YOLO model on a frame or list of frames"""
+        return self.model(
+            source,
+            conf=self.confidence,
+            imgsz=self.imgsz,
+            device=self.device,
+            half=self.half,
+            verbose=False
+        )
+    
+    def _parse_result(self, result):
+        """Convert one YOLO result into Detections"""
+        # Pull all boxes to the host at once instead of syncing per box.
+        # The host arrays are used as-is (no extra per-frame copies) when they
+        # already have the target dtype, which is the case for FP32 outputs.
+        boxes = result.boxes
+        xyxy = boxes.xyxy.detach().cpu().numpy().astype(np.float32, copy=False).reshape(-1, 4)
+        conf = boxes.conf.detach().cpu().numpy().astype(np.float32, copy=False)
+        cls = boxes.cls.detach().cpu().numpy().astype(np.int32)
+        
+        return self._to_detections(xyxy, conf, cls)
+    
+    def _to_detections(self, xyxy, conf, cls):
+        """Build Detections from host arrays, looking up class names"""
+        return Detections(
+            xyxy=xyxy,
+            conf=conf,
+            cls=cls,
+            names=[self.class_names[cls_id] for cls_id in cls.tolist()]
+        )
     
     def get_class_names(self):
         """Get list of all class names"""
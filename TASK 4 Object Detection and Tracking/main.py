@@ -3,69 +3,208 @@ Main Object Detection and Tracking Pipeline
 Combines YOLOv8 detection with SORT tracking for real-time video processing
 """
 
+import os
 import cv2
 import numpy as np
 import time
 import argparse
+import threading
+from collections import deque
 from pathlib import Path
+from queue import Queue, Empty, Full
 
-from detector import ObjectDetector
+from detector import ObjectDetector, Detections
 from sort_tracker import SORTTracker
 from visualizer import Visualizer
 
 
+# Let FFmpeg encode with all CPU cores (OpenCV already sizes the decoder's
+# frame+slice threading from the CPU count). OpenCV reads this when a writer
+# is opened, and a value already set in the environment takes precedence.
+os.environ.setdefault('OPENCV_FFMPEG_WRITER_OPTIONS', 'threads;0')
+
+
+class BackgroundWriter:
+    """
+    Drop-in wrapper for cv2.VideoWriter that encodes on a background thread,
+    so the caller's loop pays for a queue put instead of a blocking encode.
+    
+    Frames are written as-is, not copied: the caller hands each frame over and
+    must not modify it after write(). Frames from cap.read() are fresh
+    arrays, so the processing loops never touch a frame once it is queued.
+    """
+    
+    def __init__(self, writer, queue_size=8):
+        """
+        Args:
+            writer: Opened cv2.VideoWriter
+            queue_size: Frames that may wait for the encoder before write() blocks
+        """
+        self.writer = writer
+        self._enc_q = Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._encoder_worker, daemon=True)
+        self._thread.start()
+    
+    def write(self, frame):
+        """Queue a frame for encoding"""
+        self._enc_q.put(frame)
+    
+    def release(self):
+        """Wait for queued frames to be encoded, then close the writer"""
+        self._enc_q.put(None)
+        self._thread.join()
+        self.writer.release()
+    
+    def _encoder_worker(self):
+        """Encoder thread: write frames from the queue until None"""
+        failed = False
+        while True:
+            frame = self._enc_q.get()
+            if frame is None:
+                break
+            # After a failure keep draining so write() never blocks forever
+            if failed:
+                continue
+            try:
+                self.writer.write(frame)
+            except Exception as e:
+                print(f"Error writing output video: {e}")
+                failed = True
+
+
 class DetectionTrackingPipeline:
     """Main pipeline for detection and tracking"""
     
+    # Number of recent frames the FPS readout averages over
+    FPS_WINDOW = 60
+    
     def __init__(self, 
                  model_name='yolov8n.pt',
                  confidence=0.5,
                  max_age=30,
                  min_hits=3,
-                 iou_threshold=0.3):
+                 iou_threshold=0.3,
+                 batch_size=8,
+                 detect_every=1,
+                 precision=None,
+                 tensorrt=False):
         """
         Initialize the pipeline.
         
         Args:
-            model_name: YOLOv8 model variant
+            model_name: YOLOv8 model variant or TensorRT .engine file
             confidence: Detection confidence threshold
             max_age: Max frames to keep track without detections
             min_hits: Min detections to start tracking
             iou_threshold: IoU threshold for track association
+            batch_size: Frames per detector call when processing video files
+            detect_every: Run the detector on every K-th frame only; tracks and
+                detections are held at their last detected positions on the
+                frames in between (1 detects every frame)
+            precision: 'fp16' or 'fp32' PyTorch inference; defaults to fp16 on
+                CUDA and fp32 on CPU (TensorRT engines use their own precision)
+            tensorrt: Run inference through an FP16 TensorRT engine
         """
-        self.detector = ObjectDetector(model_name, confidence)
+        self.batch_size = max(1, batch_size)
+        self.detect_every = max(1, detect_every)
+        self.detector = ObjectDetector(
+            model_name,
+            confidence,
+            half=None if precision is None else precision == 'fp16',
+            tensorrt=tensorrt,
+            max_batch=self.batch_size
+        )
         self.tracker = SORTTracker(max_age, min_hits, iou_threshold)
         self.visualizer = Visualizer()
         
-        # Performance tracking
+        # Frames seen so far, for choosing which ones to detect on, and the
+        # detections of the last frame the detector ran on
+        self.frame_idx = 0
+        self.last_detections = Detections.empty()
+        
+        # Performance tracking: frames processed so far, and the timestamps of
+        # the last FPS_WINDOW frames for a sliding-window FPS
         self.frame_count = 0
         self.fps = 0
-        self.prev_time = time.time()
+        self.frame_times = deque(maxlen=self.FPS_WINDOW)
         
-    def process_frame(self, frame, draw_detections=True, draw_tracks=True):
+    def process_frame(self, frame, draw_detections=True, draw_tracks=True, out=None):
         """
         Process a single frame.
         
+        Visualizations are drawn in place: into `frame` itself by default, or
+        into `out` (a reusable buffer with the frame's shape and dtype) when the
+        caller needs to keep the original pixels. Detections and tracks hold
+        their own coordinates, so they don't depend on the drawn pixels.
+        
         Args:
             frame: Input frame (BGR image)
             draw_detections: Whether to draw detection boxes
             draw_tracks: Whether to draw tracking boxes
+            out: Optional output buffer to draw into instead of `frame`
             
         Returns:
-            processed_frame: Frame with visualizations
-            detections: List of detection dicts
-            tracks: Array of track info
+            processed_frame: Frame with visualizations (`frame` or `out`)
+            detections: Detections (parallel xyxy/conf/cls/names arrays)
+            tracks: Array of track info; a view of the tracker's output buffer,
+                valid until the next frame is processed
         """
-        self.frame_count += 1
+        # Detect objects (None on frames the detector skips)
+        detections = self._detect_frames([frame])[0]
         
-        # Detect objects
-        bboxes, detections = self.detector.detect(frame)
+        return self._track_and_draw(frame, detections, draw_detections, draw_tracks, out)
+    
+    def _detect_frames(self, frames, use_graph=False):
+        """
+        Run the detector, in one batch, on the frames due for detection (every
+        detect_every-th frame seen).
         
-        # Track objects
-        tracks = self.tracker.update(bboxes)
+        Args:
+            frames: List of consecutive input frames
+            use_graph: Detect a lone frame with the detector's CUDA Graph
+            
+        Returns:
+            List with the Detections of each frame, or None for skipped frames
+        """
+        due = []
+        for _ in frames:
+            due.append(self.frame_idx % self.detect_every == 0)
+            self.frame_idx += 1
+        
+        keyframes = [frame for frame, is_due in zip(frames, due) if is_due]
+        if use_graph and len(keyframes) == 1:
+            found = [self.detector.detect_graph(keyframes[0])]
+        else:
+            found = self.detector.detect_batch(keyframes)
+        
+        found = iter(found)
+        return [next(found) if is_due else None for is_due in due]
+    
+    def _track_and_draw(self, frame, detections, draw_detections, draw_tracks, out=None):
+        """
+        Update tracks with a frame's detections and draw the results.
+        detections is None for frames the detector skipped; those frames hold
+        the tracks in place and show the last detected frame's detections, so
+        the overlay doesn't flicker between keyframes.
+        """
+        self.frame_count += 1
         
-        # Draw on frame
-        output_frame = frame.copy()
+        # Track objects; skipped frames keep the tracks where they are. The
+        # tracks are drawn before the next update, so the tracker's buffer
+        # needn't be copied
+        if detections is None:
+            detections = self.last_detections
+            tracks = self.tracker.predict_only(copy=False)
+        else:
+            self.last_detections = detections
+            tracks = self.tracker.update(detections.xyxy, copy=False)
+        
+        # Draw on the frame itself unless the caller supplied an output buffer
+        if out is None:
+            output_frame = frame
+        else:
+            np.copyto(out, frame)
+            output_frame = out
         if draw_detections:
             output_frame = self.visualizer.draw_detections(output_frame, detections)
         if draw_tracks:
@@ -80,22 +219,176 @@ class DetectionTrackingPipeline:
             len(tracks)
         )
         
-        # Update FPS
-        current_time = time.time()
-        if current_time - self.prev_time > 0.1:  # Update every 0.1 seconds
-            self.fps = self.frame_count / (current_time - self.prev_time)
-            self.frame_count = 0
-            self.prev_time = current_time
+        # Update FPS over the recent frames
+        self.frame_times.append(time.monotonic())
+        if len(self.frame_times) >= 2:
+            elapsed = self.frame_times[-1] - self.frame_times[0]
+            if elapsed > 0:
+                self.fps = (len(self.frame_times) - 1) / elapsed
         
         return output_frame, detections, tracks
     
-    def process_webcam(self, display=True, save_output=None):
+    def _stream(self, cap, batch_size, queue_size=4, max_latency_frames=None):
+        """
+        Process frames from an open capture as a three-stage pipeline joined by
+        bounded queues: a capture thread decodes frames, an inference thread
+        detects, tracks and draws them, and the calling thread consumes the
+        results (display/encode). Throughput is bounded by the slowest stage
+        rather than the sum of all three.
+        
+        Args:
+            cap: Opened cv2.VideoCapture
+            batch_size: Frames per detector call
+            queue_size: Capacity of the queues between stages
+            max_latency_frames: For live sources, how many captured frames may
+                wait for inference; when full, the oldest are dropped instead of
+                stalling capture (None never drops frames)
+            
+        Yields:
+            (processed_frame, detections, tracks) for each frame, in order
+        """
+        drop_stale = max_latency_frames is not None
+        if drop_stale:
+            frame_q = Queue(maxsize=max(1, max_latency_frames))
+        else:
+            frame_q = Queue(maxsize=max(queue_size, batch_size))
+        render_q = Queue(maxsize=max(queue_size, batch_size))
+        stop = threading.Event()
+        errors = []
+        
+        threads = [
+            threading.Thread(target=self._capture_worker,
+                             args=(cap, frame_q, stop, errors, drop_stale), daemon=True),
+            threading.Thread(target=self._inference_worker,
+                             args=(frame_q, render_q, batch_size, stop, errors), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        
+        try:
+            while True:
+                item = render_q.get()
+                if item is None:
+                    break
+                yield item
+            
+            if errors:
+                raise errors[0]
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+    
+    def _capture_worker(self, cap, frame_q, stop, errors, drop_stale=False):
+        """
+        Capture thread: decode frames into frame_q, ending with None. With
+        drop_stale, capture never waits on inference: the oldest queued frames
+        are discarded instead, so the driver's own buffer can't fill with stale
+        frames either.
+        """
+        try:
+            while not stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if drop_stale:
+                    self._put_latest(frame_q, frame)
+                elif not self._put(frame_q, frame, stop):
+                    break
+        except Exception as e:
+            errors.append(e)
+        finally:
+            self._put(frame_q, None, stop)
+    
+    def _inference_worker(self, frame_q, render_q, batch_size, stop, errors):
+        """
+        Inference thread: detect batches from frame_q, then track and draw each
+        frame in order into render_q, ending with None. The tracker is only
+        touched from this thread, which runs ahead of the consumer, so each
+        frame's tracks are copied out of the tracker's buffer before queueing.
+        """
+        try:
+            done = False
+            while not done:
+                frames = []
+                while len(frames) < batch_size:
+                    frame = self._get(frame_q, stop)
+                    if frame is None:
+                        done = True
+                        break
+                    frames.append(frame)
+                
+                # Single-frame streams replay the detector's CUDA Graph
+                batch_detections = self._detect_frames(frames, use_graph=batch_size == 1)
+                
+                for frame, detections in zip(frames, batch_detections):
+                    output_frame, detections, tracks = self._track_and_draw(frame, detections, True, True)
+                    result = (output_frame, detections, tracks.copy())
+                    if not self._put(render_q, result, stop):
+                        return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            self._put(render_q, None, stop)
+    
+    @staticmethod
+    def _put(q, item, stop):
+        """Put item on q, giving up once stop is set. Returns True if queued."""
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+    
+    @staticmethod
+    def _put_latest(q, item):
+        """Put item on q without blocking, discarding the oldest items to make room"""
+        while True:
+            try:
+                q.put_nowait(item)
+                return
+            except Full:
+                try:
+                    q.get_nowait()
+                except Empty:
+                    pass
+    
+    @staticmethod
+    def _get(q, stop):
+        """Get an item from q, returning None once stop is set"""
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except Empty:
+                pass
+        return None
+    
+    @staticmethod
+    def _open_writer(path, fps, width, height):
+        """
+        Open an output video writer, preferring H.264 (multithreaded libx264)
+        and falling back to MPEG-4 when OpenCV was built without it. Frames
+        are encoded on a background thread (see BackgroundWriter).
+        """
+        for codec in ('avc1', 'mp4v'):
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+            if writer.isOpened():
+                return BackgroundWriter(writer)
+            writer.release()
+        print(f"Error: Cannot open video writer for {path}")
+        return None
+    
+    def process_webcam(self, display=True, save_output=None, max_latency_frames=1):
         """
         Process video stream from webcam.
         
         Args:
             display: Whether to display output
             save_output: Path to save output video (optional)
+            max_latency_frames: Captured frames allowed to wait for inference;
+                older ones are dropped so the output stays near real time
         """
         cap = cv2.VideoCapture(0)
         
@@ -103,6 +396,9 @@ class DetectionTrackingPipeline:
             print("Error: Cannot open webcam")
             return
         
+        # Keep the driver from queueing stale frames
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        
         # Get video properties
         fps = cap.get(cv2.CAP_PROP_FPS)
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
@@ -111,32 +407,30 @@ class DetectionTrackingPipeline:
         # Setup video writer if saving
         writer = None
         if save_output:
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            writer = cv2.VideoWriter(save_output, fourcc, fps, (width, height))
+            writer = self._open_writer(save_output, fps, width, height)
         
         print(f"Processing webcam stream at {width}x{height}@{fps}fps")
         print("Press 'q' to quit")
         
+        # Webcam frames are detected one at a time, through short queues, and
+        # frames inference can't keep up with are dropped to keep latency low
+        stream = self._stream(cap, batch_size=1, queue_size=2,
+                              max_latency_frames=max_latency_frames)
+        
         try:
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # Process frame
-                output_frame, detections, tracks = self.process_frame(frame)
-                
+            for output_frame, detections, tracks in stream:
                 # Display
                 if display:
                     cv2.imshow('Detection & Tracking', output_frame)
                     if cv2.waitKey(1) & 0xFF == ord('q'):
                         break
                 
-                # Save
+                # Save (encoded in the background)
                 if writer:
                     writer.write(output_frame)
         
         finally:
+            stream.close()
             cap.release()
             if writer:
                 writer.release()
@@ -152,7 +446,7 @@ class DetectionTrackingPipeline:
             display: Whether to display output
             save_output: Path to save output video (optional)
         """
-        cap = cv2.VideoCapture(str(video_path))
+        cap = cv2.VideoCapture(str(video_path), cv2.CAP_FFMPEG)
         
         if not cap.isOpened():
             print(f"Error: Cannot open video file {video_path}")
@@ -167,8 +461,7 @@ class DetectionTrackingPipeline:
         # Setup video writer if saving
         writer = None
         if save_output:
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            writer = cv2.VideoWriter(save_output, fourcc, fps, (width, height))
+            writer = self._open_writer(save_output, fps, width, height)
         
         print(f"Processing {video_path}")
         print(f"Resolution: {width}x{height}, FPS: {fps}, Total frames: {total_frames}")
@@ -176,17 +469,13 @@ class DetectionTrackingPipeline:
         
         frame_count = 0
         
+        # Frames reach the detector in batches of batch_size
+        stream = self._stream(cap, batch_size=self.batch_size)
+        
         try:
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
+            for output_frame, detections, tracks in stream:
                 frame_count += 1
                 
-                # Process frame
-                output_frame, detections, tracks = self.process_frame(frame)
-                
                 # Display
                 if display:
                     # Add progress info
@@ -198,7 +487,7 @@ class DetectionTrackingPipeline:
                     if cv2.waitKey(1) & 0xFF == ord('q'):
                         break
                 
-                # Save
+                # Save (encoded in the background)
                 if writer:
                     writer.write(output_frame)
                 
@@ -207,6 +496,7 @@ class DetectionTrackingPipeline:
                     print(f"Processed {frame_count}/{total_frames} frames")
         
         finally:
+            stream.close()
             cap.release()
             if writer:
                 writer.release()
@@ -220,14 +510,23 @@ def main():
     parser.add_argument('--source', type=str, default='webcam',
                        help='Video source: "webcam" or path to video file')
     parser.add_argument('--model', type=str, default='yolov8n.pt',
-                       choices=['yolov8n.pt', 'yolov8s.pt', 'yolov8m.pt', 'yolov8l.pt', 'yolov8x.pt'],
-                       help='YOLOv8 model variant')
+                       help='YOLOv8 model variant (yolov8n/s/m/l/x.pt) or a TensorRT .engine file')
     parser.add_argument('--confidence', type=float, default=0.5,
                        help='Detection confidence threshold')
     parser.add_argument('--output', type=str, default=None,
                        help='Path to save output video')
     parser.add_argument('--no-display', action='store_true',
                        help='Disable display window')
+    parser.add_argument('--batch-size', type=int, default=8,
+                       help='Frames per detector call for video files (webcam is always 1)')
+    parser.add_argument('--max-latency-frames', type=int, default=1,
+                       help='Webcam frames allowed to wait for inference before older ones are dropped')
+    parser.add_argument('--detect-every', type=int, default=1,
+                       help='Run the detector on every K-th frame and hold tracks in between')
+    parser.add_argument('--precision', type=str, default=None, choices=['fp32', 'fp16'],
+                       help='PyTorch inference precision (default: fp16 on CUDA, fp32 on CPU)')
+    parser.add_argument('--tensorrt', action='store_true',
+                       help='Export the model to an FP16 TensorRT engine (cached next to the .pt) and run it')
     
     args = parser.parse_args()
     
@@ -235,14 +534,19 @@ def main():
     print("Initializing detection and tracking pipeline...")
     pipeline = DetectionTrackingPipeline(
         model_name=args.model,
-        confidence=args.confidence
+        confidence=args.confidence,
+        batch_size=args.batch_size,
+        detect_every=args.detect_every,
+        precision=args.precision,
+        tensorrt=args.tensorrt
     )
     
     # Process video
     if args.source.lower() == 'webcam':
         pipeline.process_webcam(
             display=not args.no_display,
-            save_output=args.output
+            save_output=args.output,
+            max_latency_frames=args.max_latency_frames
         )
     else:
         pipeline.process_video_file(
@@ -7,58 +7,71 @@ import numpy as np
 from scipy.optimize import linear_sum_assignment
 from scipy.spatial.distance import cdist
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Weight of a new measurement when blending it into a track's state
+MEASUREMENT_WEIGHT = 0.3
+
+
+def bboxes_to_states(bboxes):
+    """Convert bboxes (N, 4) [x1, y1, x2, y2] to states (N, 4) [cx, cy, w, h]"""
+    bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    states = np.empty_like(bboxes)
+    states[:, 0] = (bboxes[:, 0] + bboxes[:, 2]) / 2
+    states[:, 1] = (bboxes[:, 1] + bboxes[:, 3]) / 2
+    states[:, 2] = bboxes[:, 2] - bboxes[:, 0]
+    states[:, 3] = bboxes[:, 3] - bboxes[:, 1]
+    return states
+
+
+def states_to_bboxes(states, out=None):
+    """
+    Convert states (N, 4) [cx, cy, w, h] to bboxes (N, 4) [x1, y1, x2, y2].
+    out: optional preallocated (N, 4) array to write the bboxes into
+    """
+    states = np.asarray(states, dtype=np.float64).reshape(-1, 4)
+    bboxes = np.empty_like(states) if out is None else out
+    bboxes[:, 0] = states[:, 0] - states[:, 2] / 2
+    bboxes[:, 1] = states[:, 1] - states[:, 3] / 2
+    bboxes[:, 2] = states[:, 0] + states[:, 2] / 2
+    bboxes[:, 3] = states[:, 1] + states[:, 3] / 2
+    return bboxes
 
-class KalmanFilterTracker:
-    """Simple Kalman Filter for object tracking"""
-    
-    def __init__(self, bbox):
-        """
-        Initialize Kalman Filter tracker with initial bounding box.
-        bbox: [x1, y1, x2, y2] in pixel coordinates
-        """
-        self.bbox = bbox
-        self.state = self._bbox_to_state(bbox)
-        self.covariance = np.eye(4) * 10
-        self.age = 1
-        self.hits = 1
-        self.id = None
-        
-    def _bbox_to_state(self, bbox):
-        """Convert bbox [x1, y1, x2, y2] to state [cx, cy, w, h]"""
-        x1, y1, x2, y2 = bbox
-        cx = (x1 + x2) / 2
-        cy = (y1 + y2) / 2
-        w = x2 - x1
-        h = y2 - y1
-        return np.array([cx, cy, w, h])
-    
-    def _state_to_bbox(self, state):
-        """Convert state [cx, cy, w, h] to bbox [x1, y1, x2, y2]"""
-        cx, cy, w, h = state
-        x1 = cx - w / 2
-        y1 = cy - h / 2
-        x2 = cx + w / 2
-        y2 = cy + h / 2
-        return np.array([x1, y1, x2, y2])
-    
-    def predict(self):
-        """Predict new state using simple velocity model"""
-        # Simple constant velocity model
-        self.state = self.state  # Keep same state (can be enhanced with velocity)
-        self.age += 1
-        return self._state_to_bbox(self.state)
-    
-    def update(self, bbox):
-        """Update state with new measurement"""
-        new_state = self._bbox_to_state(bbox)
-        # Simple average update
-        self.state = 0.7 * self.state + 0.3 * new_state
-        self.hits += 1
-        self.bbox = self._state_to_bbox(self.state)
-    
-    def get_bbox(self):
-        """Get current bounding box as [x1, y1, x2, y2]"""
-        return self._state_to_bbox(self.state)
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True)
+    def _update_states(states, idx, bboxes, alpha):
+        """Blend measured bboxes into states[idx] in place (fused convert + update)"""
+        for k in range(idx.shape[0]):
+            i = idx[k]
+            x1, y1, x2, y2 = bboxes[k, 0], bboxes[k, 1], bboxes[k, 2], bboxes[k, 3]
+            states[i, 0] = (1.0 - alpha) * states[i, 0] + alpha * (x1 + x2) / 2
+            states[i, 1] = (1.0 - alpha) * states[i, 1] + alpha * (y1 + y2) / 2
+            states[i, 2] = (1.0 - alpha) * states[i, 2] + alpha * (x2 - x1)
+            states[i, 3] = (1.0 - alpha) * states[i, 3] + alpha * (y2 - y1)
+else:
+    def _update_states(states, idx, bboxes, alpha):
+        """Blend measured bboxes into states[idx] in place"""
+        states[idx] = (1.0 - alpha) * states[idx] + alpha * bboxes_to_states(bboxes)
+
+
+def update_states(states, idx, bboxes, alpha=MEASUREMENT_WEIGHT):
+    """
+    Update several track states with new measurements at once.
+    states: array of shape (N, 4) [cx, cy, w, h], updated in place
+    idx: indices of the states to update
+    bboxes: array of shape (len(idx), 4) with measured [x1, y1, x2, y2]
+    """
+    _update_states(
+        states,
+        np.ascontiguousarray(idx, dtype=np.int64),
+        np.ascontiguousarray(bboxes, dtype=np.float64),
+        float(alpha)
+    )
 
 
 def iou(bbox1, bbox2):
@@ -88,8 +101,73 @@ def iou(bbox1, bbox2):
     return inter_area / union_area
 
 
+def iou_batch(bboxes1, bboxes2):
+    """
+    Calculate IoU between every pair of bboxes from two sets at once.
+    bboxes1: array of shape (N, 4), bboxes2: array of shape (M, 4), both [x1, y1, x2, y2]
+    Returns: array of shape (N, M) where [i, j] is the IoU of bboxes1[i] and bboxes2[j]
+    """
+    b1 = np.asarray(bboxes1, dtype=np.float64)[:, None, :]
+    b2 = np.asarray(bboxes2, dtype=np.float64)[None, :, :]
+    
+    # Intersection area of every pair (zero where boxes don't overlap)
+    inter_w = np.clip(np.minimum(b1[..., 2], b2[..., 2]) - np.maximum(b1[..., 0], b2[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(b1[..., 3], b2[..., 3]) - np.maximum(b1[..., 1], b2[..., 1]), 0, None)
+    inter_area = inter_w * inter_h
+    
+    # Union area of every pair
+    area1 = (b1[..., 2] - b1[..., 0]) * (b1[..., 3] - b1[..., 1])
+    area2 = (b2[..., 2] - b2[..., 0]) * (b2[..., 3] - b2[..., 1])
+    union_area = area1 + area2 - inter_area
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ious = inter_area / union_area
+    return np.where(union_area > 0, ious, 0.0)
+
+
+def greedy_assignment(iou_matrix, iou_threshold):
+    """
+    Match rows to columns greedily by descending IoU: take the best remaining
+    pair while both its detection and prediction are still unmatched.
+    iou_matrix: array of shape (N, M)
+    iou_threshold: pairs with IoU at or below this are never matched
+    Returns: array of shape (K, 2) with matched [row, col] pairs
+    """
+    num_cols = iou_matrix.shape[1]
+    
+    # Only pairs above the threshold can match; visit them best first
+    candidates = np.flatnonzero(iou_matrix > iou_threshold)
+    candidates = candidates[np.argsort(-iou_matrix.ravel()[candidates], kind='stable')]
+    
+    row_taken = np.zeros(iou_matrix.shape[0], dtype=bool)
+    col_taken = np.zeros(num_cols, dtype=bool)
+    max_matches = min(iou_matrix.shape)
+    matched = []
+    for idx in candidates.tolist():
+        d, p = divmod(idx, num_cols)
+        if row_taken[d] or col_taken[p]:
+            continue
+        row_taken[d] = col_taken[p] = True
+        matched.append((d, p))
+        if len(matched) == max_matches:
+            break
+    
+    return np.array(matched, dtype=int).reshape(-1, 2)
+
+
 class SORTTracker:
-    """SORT (Simple Online and Realtime Tracking) tracker"""
+    """
+    SORT (Simple Online and Realtime Tracking) tracker.
+    Track state is kept as parallel arrays over all tracks (one row per track)
+    so each frame's predict/update runs once for every track instead of per object.
+    """
+    
+    # Above this many detections or tracks, match with the Hungarian algorithm;
+    # below it a greedy IoU match gives the same pairs at typical densities
+    HUNGARIAN_MIN_SIZE = 50
+    
+    # Track slots preallocated up front; the buffers double when they fill up
+    INITIAL_CAPACITY = 64
     
     def __init__(self, max_age=30, min_hits=3, iou_threshold=0.3):
         """
@@ -101,23 +179,55 @@ class SORTTracker:
         self.max_age = max_age
         self.min_hits = min_hits
         self.iou_threshold = iou_threshold
-        self.trackers = []
         self.next_id = 1
         self.frame_count = 0
         
-    def update(self, detections):
+        # Per-track arrays: state [cx, cy, w, h], consecutive frames without a
+        # matched detection, hit count and track ID. They are views of the
+        # first num_tracks rows of preallocated buffers, so adding and removing
+        # tracks doesn't allocate new arrays every frame.
+        self.num_tracks = 0
+        self._allocate(self.INITIAL_CAPACITY)
+    
+    def _allocate(self, capacity):
+        """Allocate per-track buffers with room for `capacity` tracks, keeping live tracks"""
+        n = self.num_tracks
+        old = getattr(self, '_buffers', None)
+        self._buffers = (
+            np.empty((capacity, 4)),         # states
+            np.empty(capacity, dtype=int),   # misses
+            np.empty(capacity, dtype=int),   # hits
+            np.empty(capacity, dtype=int),   # ids
+        )
+        if old is not None:
+            for new_buf, old_buf in zip(self._buffers, old):
+                new_buf[:n] = old_buf[:n]
+        
+        # Scratch space for predictions and output rows
+        self._pred_buf = np.empty((capacity, 4))
+        self._out_buf = np.empty((capacity, 5))
+        self._set_num_tracks(n)
+    
+    def _set_num_tracks(self, n):
+        """Point the per-track views at the first n rows of the buffers"""
+        self.num_tracks = n
+        self.states, self.misses, self.hits, self.ids = (buf[:n] for buf in self._buffers)
+        
+    def update(self, detections, copy=True):
         """
         Update tracks with new detections.
         detections: array of shape (N, 4) with format [x1, y1, x2, y2]
+        copy: Return an array the caller owns; with False the result is a view
+            of an internal buffer that the next update() overwrites
         Returns: array of shape (M, 5) with format [x1, y1, x2, y2, track_id]
         """
         self.frame_count += 1
+        detections = np.asarray(detections, dtype=np.float64).reshape(-1, 4)
         
-        # Predict
-        predictions = []
-        for tracker in self.trackers:
-            predictions.append(tracker.predict())
-        predictions = np.array(predictions) if predictions else np.empty((0, 4))
+        # Predict (constant position model); every track counts as missed
+        # until it is matched below
+        self.misses += 1
+        predictions = states_to_bboxes(self.states, out=self._pred_buf[:self.num_tracks])
         
         # Associate detections with predictions
         matched, unmatched_dets, unmatched_trks = self._associate(
@@ -125,60 +235,88 @@ class SORTTracker:
         )
         
         # Update matched trackers
-        for d, t in matched:
-            self.trackers[t].update(detections[d])
+        if len(matched):
+            update_states(self.states, matched[:, 1], detections[matched[:, 0]])
+            self.hits[matched[:, 1]] += 1
+            self.misses[matched[:, 1]] = 0
         
         # Create new trackers for unmatched detections
-        for d in unmatched_dets:
-            tracker = KalmanFilterTracker(detections[d])
-            tracker.id = self.next_id
-            self.next_id += 1
-            self.trackers.append(tracker)
+        if len(unmatched_dets):
+            n = self.num_tracks
+            num_new = len(unmatched_dets)
+            if n + num_new > len(self._out_buf):
+                self._allocate(max(2 * len(self._out_buf), n + num_new))
+            
+            states, misses, hits, ids = self._buffers
+            states[n:n + num_new] = bboxes_to_states(detections[unmatched_dets])
+            misses[n:n + num_new] = 0
+            hits[n:n + num_new] = 1
+            ids[n:n + num_new] = np.arange(self.next_id, self.next_id + num_new)
+            self.next_id += num_new
+            self._set_num_tracks(n + num_new)
         
-        # Remove dead trackers
-        self.trackers = [
-            t for t in self.trackers 
-            if (t.age - t.hits) < self.max_age
-        ]
+        # Remove dead trackers; only tracks missed this frame can have died.
+        # Survivors are compacted to the front of the buffers in place.
+        if len(unmatched_trks):
+            alive = self.misses < self.max_age
+            if not alive.all():
+                num_alive = int(np.count_nonzero(alive))
+                for buf in self._buffers:
+                    buf[:num_alive] = buf[:self.num_tracks][alive]
+                self._set_num_tracks(num_alive)
         
-        # Output
-        ret = []
-        for tracker in self.trackers:
-            if tracker.hits >= self.min_hits or self.frame_count <= self.min_hits:
-                bbox = tracker.get_bbox()
-                ret.append([*bbox, tracker.id])
+        return self._output(copy)
+    
+    def predict_only(self, copy=True):
+        """
+        Carry tracks through a frame the detector skipped, without association.
+        With the constant position model this is a hold, not a motion step:
+        tracks stay where they were last updated. The frame counts as neither
+        a hit nor a miss, so max_age and min_hits keep meaning detector frames.
+        copy: As for update()
+        Returns: array of shape (M, 5) with format [x1, y1, x2, y2, track_id]
+        """
+        # Constant position model: predicted boxes are the current states
+        return self._output(copy)
+    
+    def _output(self, copy=True):
+        """Confirmed tracks as an array of shape (M, 5) [x1, y1, x2, y2, track_id]"""
+        if self.frame_count <= self.min_hits:
+            shown = slice(None)
+            num_shown = self.num_tracks
+        else:
+            shown = self.hits >= self.min_hits
+            num_shown = int(np.count_nonzero(shown))
         
-        return np.array(ret) if ret else np.empty((0, 5))
+        out = self._out_buf[:num_shown]
+        states_to_bboxes(self.states[shown], out=out[:, :4])
+        out[:, 4] = self.ids[shown]
+        return out.copy() if copy else out
     
     def _associate(self, detections, predictions):
         """
         Associate detections with predictions using IoU.
         Returns: matched pairs, unmatched detections, unmatched predictions
         """
+        no_matches = np.empty((0, 2), dtype=int)
         if len(predictions) == 0:
-            return [], list(range(len(detections))), []
+            return no_matches, list(range(len(detections))), []
         
         if len(detections) == 0:
-            return [], [], list(range(len(predictions)))
+            return no_matches, [], list(range(len(predictions)))
         
         # Calculate IoU matrix
-        iou_matrix = np.zeros((len(detections), len(predictions)))
-        for d in range(len(detections)):
-            for p in range(len(predictions)):
-                iou_matrix[d, p] = iou(detections[d], predictions[p])
-        
-        # Hungarian algorithm
-        det_indices, pred_indices = linear_sum_assignment(-iou_matrix)
+        iou_matrix = iou_batch(detections, predictions)
         
-        matched = []
-        for d, p in zip(det_indices, pred_indices):
-            if iou_matrix[d, p] > self.iou_threshold:
-                matched.append([d, p])
+        if max(iou_matrix.shape) > self.HUNGARIAN_MIN_SIZE:
+            # Hungarian algorithm
+            det_indices, pred_indices = linear_sum_assignment(-iou_matrix)
+            keep = iou_matrix[det_indices, pred_indices] > self.iou_threshold
+            matched = np.stack([det_indices[keep], pred_indices[keep]], axis=1).astype(int)
+        else:
+            matched = greedy_assignment(iou_matrix, self.iou_threshold)
         
-        matched = np.array(matched)
-        unmatched_dets = [d for d in range(len(detections)) 
-                         if d not in matched[:, 0]]
-        unmatched_trks = [p for p in range(len(predictions)) 
-                         if p not in matched[:, 1]]
+        unmatched_dets = np.setdiff1d(np.arange(len(detections)), matched[:, 0]).tolist()
+        unmatched_trks = np.setdiff1d(np.arange(len(predictions)), matched[:, 1]).tolist()
         
         return matched, unmatched_dets, unmatched_trks
@@ -0,0 +1,162 @@
+"""
+Tests for the SORT tracker: IoU, greedy matching and track identity
+Run with: python -m pytest test_sort_tracker.py
+"""
+
+import numpy as np
+
+import sort_tracker
+from sort_tracker import SORTTracker, greedy_assignment, iou, iou_batch
+
+
+def random_boxes(rng, n):
+    """n random [x1, y1, x2, y2] boxes, including some degenerate ones"""
+    xy = rng.uniform(0, 100, size=(n, 2))
+    wh = rng.uniform(0, 40, size=(n, 2))
+    wh[::5] = 0  # zero-area boxes
+    return np.hstack([xy, xy + wh])
+
+
+def test_iou_batch_matches_iou():
+    rng = np.random.default_rng(0)
+    boxes1 = random_boxes(rng, 12)
+    boxes2 = random_boxes(rng, 7)
+    
+    expected = np.array([[iou(b1, b2) for b2 in boxes2] for b1 in boxes1])
+    
+    np.testing.assert_allclose(iou_batch(boxes1, boxes2), expected)
+
+
+def test_iou_batch_empty():
+    boxes = np.array([[0, 0, 10, 10]], dtype=float)
+    
+    assert iou_batch(np.empty((0, 4)), boxes).shape == (0, 1)
+    assert iou_batch(boxes, np.empty((0, 4))).shape == (1, 0)
+
+
+def test_greedy_assignment_takes_best_pairs_first():
+    iou_matrix = np.array([
+        [0.9, 0.8],
+        [0.8, 0.1],
+    ])
+    
+    matched = greedy_assignment(iou_matrix, 0.3)
+    
+    # (0, 0) is taken first, so (1, 1) is the only pair left and is too weak
+    assert matched.tolist() == [[0, 0]]
+
+
+def test_greedy_assignment_threshold_is_exclusive():
+    iou_matrix = np.array([
+        [0.3, 0.0],
+        [0.0, 0.31],
+    ])
+    
+    assert greedy_assignment(iou_matrix, 0.3).tolist() == [[1, 1]]
+
+
+def test_greedy_assignment_rectangular():
+    wide = np.array([
+        [0.1, 0.7, 0.5],
+        [0.6, 0.65, 0.0],
+    ])
+    
+    assert sorted(greedy_assignment(wide, 0.3).tolist()) == [[0, 1], [1, 0]]
+    assert sorted(greedy_assignment(wide.T, 0.3).tolist()) == [[0, 1], [1, 0]]
+
+
+def test_greedy_assignment_empty():
+    for shape in [(0, 0), (0, 3), (3, 0)]:
+        matched = greedy_assignment(np.zeros(shape), 0.3)
+        assert matched.shape == (0, 2)
+
+
+def test_associate_switches_to_hungarian_above_min_size(monkeypatch):
+    # Greedy keeps the single best pair; Hungarian maximizes the total IoU
+    iou_matrix = np.array([
+        [0.9, 0.8],
+        [0.8, 0.1],
+    ])
+    monkeypatch.setattr(sort_tracker, 'iou_batch', lambda dets, preds: iou_matrix)
+    boxes = np.zeros((2, 4))
+    tracker = SORTTracker(iou_threshold=0.3)
+    
+    tracker.HUNGARIAN_MIN_SIZE = 2
+    matched, unmatched_dets, unmatched_trks = tracker._associate(boxes, boxes)
+    assert matched.tolist() == [[0, 0]]
+    assert unmatched_dets == [1] and unmatched_trks == [1]
+    
+    tracker.HUNGARIAN_MIN_SIZE = 1
+    matched, unmatched_dets, unmatched_trks = tracker._associate(boxes, boxes)
+    assert sorted(matched.tolist()) == [[0, 1], [1, 0]]
+    assert unmatched_dets == [] and unmatched_trks == []
+
+
+def test_update_keeps_ids_of_moving_objects():
+    tracker = SORTTracker(max_age=3, min_hits=1, iou_threshold=0.3)
+    boxes = np.array([
+        [10, 10, 50, 50],
+        [200, 200, 260, 280],
+    ], dtype=float)
+    
+    first = tracker.update(boxes)
+    ids = set(first[:, 4])
+    for step in range(1, 10):
+        # Objects drift a few pixels per frame and come back in reverse order
+        tracks = tracker.update(boxes[::-1] + 3 * step)
+        assert len(tracks) == 2
+        assert set(tracks[:, 4]) == ids
+    
+    # A new object gets a fresh ID
+    tracks = tracker.update(np.vstack([boxes + 30, [[400, 400, 440, 440]]]))
+    assert len(tracks) == 3
+    assert set(tracks[:, 4]) == {1, 2, 3}
+
+
+def test_track_survives_until_max_age_consecutive_misses():
+    tracker = SORTTracker(max_age=3, min_hits=1)
+    tracker.update(np.array([[10, 10, 50, 50]], dtype=float))
+    
+    # max_age - 1 misses in a row keep the track
+    for _ in range(2):
+        tracker.update(np.empty((0, 4)))
+    assert tracker.ids.tolist() == [1]
+    assert tracker.misses.tolist() == [2]
+    
+    # The max_age-th consecutive miss removes it
+    tracker.update(np.empty((0, 4)))
+    assert tracker.num_tracks == 0
+
+
+def test_hit_resets_miss_count():
+    tracker = SORTTracker(max_age=3, min_hits=1)
+    box = np.array([[10, 10, 50, 50]], dtype=float)
+    tracker.update(box)
+    
+    tracker.update(np.empty((0, 4)))
+    tracker.update(np.empty((0, 4)))
+    tracker.update(box)
+    assert tracker.misses.tolist() == [0]
+    
+    # Misses before the hit no longer count towards max_age
+    tracker.update(np.empty((0, 4)))
+    tracker.update(np.empty((0, 4)))
+    assert tracker.ids.tolist() == [1]
+    tracker.update(np.empty((0, 4)))
+    assert tracker.num_tracks == 0
+
+
+def test_dead_track_is_removed_while_others_match():
+    tracker = SORTTracker(max_age=2, min_hits=1)
+    kept = np.array([[10, 10, 50, 50]], dtype=float)
+    lost = np.array([[200, 200, 240, 240]], dtype=float)
+    tracker.update(np.vstack([lost, kept]))
+    
+    tracker.update(kept)
+    assert tracker.ids.tolist() == [1, 2]
+    
+    # The surviving track is compacted to the front with its state intact
+    tracks = tracker.update(kept)
+    assert tracker.ids.tolist() == [2]
+    assert tracker.misses.tolist() == [0]
+    np.testing.assert_allclose(tracks[:, :4], kept)
@@ -2,6 +2,8 @@
 Visualization utilities for drawing bounding boxes and tracking IDs
 """
 
+from functools import lru_cache
+
 import cv2
 import numpy as np
 
@@ -22,24 +24,43 @@ class Visualizer:
         (0, 128, 128),    # Dark Cyan
     ]
     
+    # Fixed parts of the frame info overlay, and where each line goes
+    INFO_LABELS = ("Frame: ", "FPS: ", "Detections: ", "Tracks: ")
+    INFO_ORIGINS = tuple((10, 30 + 30 * i) for i in range(len(INFO_LABELS)))
+    
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _get_text_size(label, font_scale, thickness):
+        """
+        Width and height of a label in the overlay font. Labels repeat from
+        frame to frame (class/confidence pairs, track IDs), so sizes are cached.
+        """
+        return cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)[0]
+    
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _detection_label(class_name, confidence, font_scale):
+        """Label text and size for a detection, keyed by confidence rounded to 2 places"""
+        label = f"{class_name} {confidence:.2f}"
+        return label, Visualizer._get_text_size(label, font_scale, 1)
+    
     @staticmethod
     def draw_detections(frame, detections, thickness=2, font_scale=0.6):
         """
         Draw detection bounding boxes with class labels.
-        detections: list of detection dicts with keys: bbox, class_name, confidence
+        detections: Detections with parallel xyxy, conf and names arrays
         """
-        for detection in detections:
-            bbox = detection['bbox']
-            x1, y1, x2, y2 = map(int, bbox)
-            class_name = detection['class_name']
-            confidence = detection['confidence']
-            
+        # Integerize all boxes at once (truncating, like int())
+        boxes = detections.xyxy.astype(np.int32).tolist()
+        
+        for (x1, y1, x2, y2), class_name, confidence in zip(boxes, detections.names, detections.conf.tolist()):
             # Draw bounding box
             cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), thickness)
             
             # Draw label with confidence
-            label = f"{class_name} {confidence:.2f}"
-            label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 1)[0]
+            label, label_size = Visualizer._detection_label(
+                class_name, round(confidence, 2), font_scale
+            )
             label_y = max(y1, label_size[1] + 10)
             
             # Draw background rectangle for label
@@ -70,11 +91,12 @@ class Visualizer:
         Draw tracking bounding boxes with tracking IDs.
         tracks: array of shape (N, 5) with format [x1, y1, x2, y2, track_id]
         """
-        for track in tracks:
-            x1, y1, x2, y2, track_id = map(int, track)
-            
+        # Integerize all boxes and IDs, and pick every track's color, at once
+        tracks_int = np.asarray(tracks).reshape(-1, 5).astype(np.int32)
+        color_indices = (tracks_int[:, 4] % len(Visualizer.COLORS)).tolist()
+        
+        for (x1, y1, x2, y2, track_id), color_idx in zip(tracks_int.tolist(), color_indices):
             # Get color based on track ID
-            color_idx = track_id % len(Visualizer.COLORS)
             color = Visualizer.COLORS[color_idx]
             
             # Draw bounding box
@@ -82,7 +104,7 @@ class Visualizer:
             
             # Draw tracking ID
             label = f"ID: {track_id}"
-            label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 2)[0]
+            label_size = Visualizer._get_text_size(label, font_scale, 2)
             label_y = max(y1, label_size[1] + 10)
             
             # Draw background rectangle for label
@@ -124,24 +146,17 @@ class Visualizer:
     @staticmethod
     def add_frame_info(frame, frame_num, fps, num_detections, num_tracks):
         """Add frame information (frame number, FPS, counts) to frame"""
-        info_text = [
-            f"Frame: {frame_num}",
-            f"FPS: {fps:.1f}",
-            f"Detections: {num_detections}",
-            f"Tracks: {num_tracks}"
-        ]
+        values = (frame_num, f"{fps:.1f}", num_detections, num_tracks)
         
-        y_offset = 30
-        for text in info_text:
+        for label, value, origin in zip(Visualizer.INFO_LABELS, values, Visualizer.INFO_ORIGINS):
             cv2.putText(
                 frame,
-                text,
-                (10, y_offset),
+                f"{label}{value}",
+                origin,
                 cv2.FONT_HERSHEY_SIMPLEX,
                 0.7,
                 (255, 255, 255),
                 2
             )
-            y_offset += 30
         
         return frame